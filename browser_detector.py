@@ -3,88 +3,346 @@
 Browser detection module for checking if x.com/twitter.com is open in various browsers.
 """
 
+import functools
+import logging
 import platform
+import re
 import subprocess
+import threading
+import time
 import psutil
 
+log = logging.getLogger(__name__)
+
+# PyObjC lets us precompile AppleScripts once and run them in-process,
+# skipping the osascript fork+exec+compile cost on every check.
+try:
+    import objc
+    from Foundation import NSAppleScript
+    PYOBJC_AVAILABLE = True
+except ImportError:
+    PYOBJC_AVAILABLE = False
+
+# NSWorkspace tracks just the GUI apps, which is far cheaper to consult
+# than walking the whole process table. It also posts app-activation
+# notifications, which let us invalidate caches without polling.
+try:
+    from AppKit import NSWorkspace, NSWorkspaceDidActivateApplicationNotification
+    from Foundation import NSObject
+    APPKIT_AVAILABLE = True
+except ImportError:
+    APPKIT_AVAILABLE = False
+
+
+if APPKIT_AVAILABLE:
+    class _AppActivationObserver(NSObject):
+        """Clears a detector's cache whenever the frontmost app changes"""
+
+        def initWithDetector_(self, detector):
+            self = objc.super(_AppActivationObserver, self).init()
+            if self is None:
+                return None
+            self._detector = detector
+            return self
+
+        def appActivated_(self, notification):
+            self._detector.invalidate_cache()
+
+
+class _OsascriptSession:
+    """A single long-lived ``osascript -i`` process that runs many scripts,
+    amortizing the fork+exec cost across queries. Only used as the fallback
+    when PyObjC isn't available."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # stdin writes aren't thread-safe
+        self._proc = None
+
+    def _spawn(self):
+        self._proc = subprocess.Popen(
+            ['osascript', '-i'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+    def run(self, script):
+        """Run a script in the shared session; returns its string result,
+        or None on error."""
+        # Interactive mode executes one line at a time, so ship the whole
+        # script as a single `run script "..."` line
+        escaped = (script.replace('\\', '\\\\')
+                         .replace('"', '\\"')
+                         .replace('\n', '\\n'))
+        with self._lock:
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._spawn()
+                self._proc.stdin.write(f'run script "{escaped}"\n')
+                self._proc.stdin.flush()
+                # Results come back as a `=> value` line; skip anything else
+                # (prompts, blank lines) up to a small cap
+                for _ in range(10):
+                    line = self._proc.stdout.readline()
+                    if not line:
+                        # EOF: session died; next call respawns it
+                        self._proc = None
+                        return None
+                    line = line.strip()
+                    if line.startswith('=>'):
+                        result = line[2:].strip()
+                        # Interactive mode echoes strings in source form
+                        if len(result) >= 2 and result[0] == '"' and result[-1] == '"':
+                            result = result[1:-1]
+                        return result
+                return None
+            except OSError:
+                self._proc = None
+                return None
+
+
+def ttl_cache(method):
+    """Cache a zero-argument method's result on the instance for cache_ttl
+    seconds, so callers hammering the detector (e.g. on every keystroke)
+    don't pay an Apple-event round trip each time."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self):
+        now = time.monotonic()
+        cached = self._cache.get(name)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        value = method(self)
+        self._cache[name] = (value, now + self._effective_ttl())
+        return value
+
+    return wrapper
+
 
 class BrowserDetector:
     """Detects if x.com/twitter.com is open in various browsers"""
-    
-    def __init__(self):
+
+    # Browsers we recognize as the frontmost app, and the subset we can
+    # query for tabs over AppleScript
+    BROWSER_APPS = ('Safari', 'Google Chrome', 'Arc', 'Firefox',
+                    'Microsoft Edge', 'Brave Browser', 'Opera', 'Vivaldi')
+    _BROWSER_APPS_LOWER = tuple((b, b.lower()) for b in BROWSER_APPS)
+    SCRIPTABLE_BROWSERS = ('Safari', 'Google Chrome', 'Arc')
+
+    # Bundle identifiers for the browsers above, for the in-process
+    # NSWorkspace prefilter
+    BROWSER_BUNDLE_IDS = frozenset({
+        'com.apple.Safari',
+        'com.google.Chrome',
+        'company.thebrowser.Browser',  # Arc
+        'org.mozilla.firefox',
+        'com.microsoft.edgemac',
+        'com.brave.Browser',
+        'com.operasoftware.Opera',
+        'com.vivaldi.Vivaldi',
+    })
+
+    def __init__(self, cache_ttl=0.5):
         self.system = platform.system()
-        
-    def is_x_com_open_mac(self):
-        """Check if x.com is open in any browser on macOS"""
-        browsers = {
-            'Safari': '''
-                tell application "Safari"
-                    if it is running then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
-                        end repeat
+        self.cache_ttl = cache_ttl
+        self._cache = {}  # method name -> (value, monotonic expiry)
+        self._compiled = {}  # name -> precompiled NSAppleScript
+        self._osa_session = _OsascriptSession()
+        self._frontmost_scripts = {
+            name: self.FRONTMOST_X_SCRIPT.format(app=name)
+            for name in self.SCRIPTABLE_BROWSERS
+        }
+        self._combined_script = self._build_combined_script()
+        # One alternation pattern matches any browser name in a single scan,
+        # instead of a substring search per browser per process
+        self._browser_regex = re.compile(
+            '|'.join(map(re.escape, self._BROWSER_PROCESSES_LOWER))
+        )
+        self._activation_observer = None
+        self.on_invalidate = None  # optional callback fired on cache invalidation
+        self._on_battery = False
+        self._battery_check_due = 0.0  # monotonic time of next power-state read
+        self._start_activation_observer()
+
+    def _start_activation_observer(self):
+        """Invalidate the cache when the frontmost app changes, so cached
+        answers stay correct without any polling timer"""
+        if not (self.system == "Darwin" and APPKIT_AVAILABLE and PYOBJC_AVAILABLE):
+            return
+        self._activation_observer = _AppActivationObserver.alloc().initWithDetector_(self)
+        NSWorkspace.sharedWorkspace().notificationCenter().addObserver_selector_name_object_(
+            self._activation_observer,
+            'appActivated:',
+            NSWorkspaceDidActivateApplicationNotification,
+            None,
+        )
+
+    def invalidate_cache(self):
+        """Drop all cached query results (e.g. after an app switch)"""
+        self._cache.clear()
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    # On battery, trade a little freshness for fewer AppleScript wakeups;
+    # power state itself is only re-read every 30 seconds
+    BATTERY_TTL_MULTIPLIER = 4
+    _BATTERY_CHECK_INTERVAL = 30.0
+
+    def _effective_ttl(self):
+        """cache_ttl, stretched by BATTERY_TTL_MULTIPLIER when on battery"""
+        now = time.monotonic()
+        if now >= self._battery_check_due:
+            self._battery_check_due = now + self._BATTERY_CHECK_INTERVAL
+            try:
+                battery = psutil.sensors_battery()
+                self._on_battery = battery is not None and not battery.power_plugged
+            except Exception:
+                self._on_battery = False
+        if self._on_battery:
+            return self.cache_ttl * self.BATTERY_TTL_MULTIPLIER
+        return self.cache_ttl
+
+    def _build_combined_script(self):
+        """Build one script that returns the frontmost app name and its x.com
+        state together, so a single Apple-event round trip answers both"""
+        branches = ''.join(
+            self.COMBINED_BRANCH.format(app=name)
+            for name in self.SCRIPTABLE_BROWSERS
+        )
+        return (
+            'tell application "System Events" to set frontApp to '
+            'name of first application process whose frontmost is true\n'
+            'set hasX to "unknown"\n'
+            + branches +
+            'return frontApp & "|" & hasX'
+        )
+
+    def _run_compiled(self, name, script, timeout=2):
+        """Run an AppleScript, reusing a precompiled NSAppleScript when PyObjC
+        is available. Falls back to spawning osascript otherwise.
+        Returns the script's string result, or None on error."""
+        if PYOBJC_AVAILABLE:
+            compiled = self._compiled.get(name)
+            if compiled is None:
+                compiled = NSAppleScript.alloc().initWithSource_(script)
+                self._compiled[name] = compiled
+            # NSAppleScript leaks result descriptors without a pool
+            with objc.autorelease_pool():
+                descriptor, error = compiled.executeAndReturnError_(None)
+                if descriptor is None:
+                    return None
+                return descriptor.stringValue()
+
+        # Fallback: reuse a long-lived osascript session (no PyObjC available)
+        result = self._osa_session.run(script)
+        if result is not None:
+            return result
+
+        # Last resort: a one-shot, timeout-protected osascript spawn
+        try:
+            result = subprocess.run(
+                ['osascript', '-e', script],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            if result.returncode == 0:
+                return result.stdout.strip()
+            return None
+        except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+            return None
+
+    # One aggregate script covering all supported browsers: a single process
+    # spawn and Apple-event round trip instead of one per browser.
+    ANY_BROWSER_SCRIPT = '''
+        using terms from application "Safari"
+            repeat with appName in {"Safari", "Google Chrome", "Arc"}
+                set appName to appName as text
+                try
+                    if application appName is running then
+                        tell application appName
+                            try
+                                if (count of (tabs of windows whose URL contains "x.com" or URL contains "twitter.com")) > 0 then
+                                    return appName & ":true"
+                                end if
+                            on error
+                                -- some browsers reject the whose-clause; fall back to iterating
+                                repeat with w in windows
+                                    repeat with t in tabs of w
+                                        try
+                                            set tabURL to URL of t
+                                            if tabURL contains "x.com" or tabURL contains "twitter.com" then
+                                                return appName & ":true"
+                                            end if
+                                        end try
+                                    end repeat
+                                end repeat
+                            end try
+                        end tell
                     end if
-                end tell
-                return "false"
-            ''',
-            'Google Chrome': '''
-                tell application "Google Chrome"
-                    if it is running then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
-                        end repeat
+                end try
+            end repeat
+        end using terms from
+        return "false"
+    '''
+
+    # Per-browser frontmost check: one filtered query so the browser searches
+    # its own tabs internally in a single Apple event, not one event per tab.
+    FRONTMOST_X_SCRIPT = '''
+        tell application "{app}"
+            if it is running and frontmost then
+                try
+                    if (count of (tabs of windows whose URL contains "x.com" or URL contains "twitter.com")) > 0 then
+                        return "true"
                     end if
-                end tell
-                return "false"
-            ''',
-            'Arc': '''
-                tell application "Arc"
-                    if it is running then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
+                on error
+                    -- some browsers reject the whose-clause; fall back to iterating
+                    repeat with w in windows
+                        repeat with t in tabs of w
+                            try
+                                set tabURL to URL of t
+                                if tabURL contains "x.com" or tabURL contains "twitter.com" then
+                                    return "true"
+                                end if
+                            end try
                         end repeat
+                    end repeat
+                end try
+            end if
+        end tell
+        return "false"
+    '''
+
+    # Per-browser branch of the combined frontmost check; separate plain
+    # if-blocks keep generation simple (frontApp matches at most one)
+    COMBINED_BRANCH = '''
+        if frontApp is "{app}" then
+            tell application "{app}"
+                try
+                    if (count of (tabs of windows whose URL contains "x.com" or URL contains "twitter.com")) > 0 then
+                        set hasX to "true"
+                    else
+                        set hasX to "false"
                     end if
-                end tell
-                return "false"
-            '''
-        }
-        
-        for browser_name, script in browsers.items():
-            try:
-                result = subprocess.run(
-                    ['osascript', '-e', script],
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                if result.stdout.strip() == "true":
-                    return True, browser_name
-            except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
-                continue
-                
+                on error
+                    set hasX to "unknown"
+                end try
+            end tell
+        end if
+    '''
+
+    def is_x_com_open_mac(self):
+        """Check if x.com is open in any browser on macOS"""
+        if not self.any_supported_browser_running():
+            return False, None
+        result = self._run_compiled('any_browser', self.ANY_BROWSER_SCRIPT, timeout=6)
+        if result and result.endswith(':true'):
+            return True, result.rsplit(':', 1)[0]
         return False, None
     
+    @ttl_cache
     def get_active_window_title_mac(self):
         """Get the title of the currently active window on macOS"""
         script = '''
@@ -100,24 +358,24 @@ class BrowserDetector:
             end tell
         '''
         try:
-            result = subprocess.run(
-                ['osascript', '-e', script],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            return result.stdout.strip()
+            result = self._run_compiled('active_window_title', script, timeout=1)
+            return result if result is not None else ""
         except:
             return ""
     
+    @staticmethod
+    def _title_has_x(title):
+        """Check whether a window title looks like an x.com page"""
+        # X.com usually shows "X" or specific page titles in the window title
+        return "x.com" in title.lower() or " / X" in title or "(@" in title
+
     def is_browser_active_with_x(self):
         """Check if the active window is a browser with x.com"""
         if self.system == "Darwin":
-            title = self.get_active_window_title_mac()
-            # X.com usually shows "X" or specific page titles in the window title
-            return "x.com" in title.lower() or " / X" in title or "(@" in title
+            return self._title_has_x(self.get_active_window_title_mac())
         return False
     
+    @ttl_cache
     def get_frontmost_application(self):
         """Get the name of the frontmost (active) application on macOS"""
         if self.system != "Darwin":
@@ -125,19 +383,12 @@ class BrowserDetector:
             
         script = 'tell application "System Events" to return name of first application process whose frontmost is true'
         try:
-            result = subprocess.run(
-                ['osascript', '-e', script],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            if result.returncode == 0:
-                return result.stdout.strip()
-            else:
-                print(f"AppleScript error: {result.stderr}")
-                return None
+            result = self._run_compiled('frontmost_application', script, timeout=1)
+            if result is None:
+                log.debug("AppleScript error getting frontmost app")
+            return result
         except Exception as e:
-            print(f"Error getting frontmost app: {e}")
+            log.debug("Error getting frontmost app: %s", e)
             return None
     
     def is_browser_frontmost_with_x_com(self):
@@ -145,118 +396,108 @@ class BrowserDetector:
         if self.system != "Darwin":
             return False, None
             
+        now = time.monotonic()
+        cached = self._cache.get('frontmost_x_com')
+        if cached is not None and now < cached[1]:
+            return cached[0]
+
+        result = self._resolve_frontmost_x_com()
+        self._cache['frontmost_x_com'] = (result, now + self._effective_ttl())
+        return result
+
+    def _resolve_frontmost_x_com(self):
+        """Run the combined frontmost-app + tab check in one Apple-event
+        round trip, falling back to the two-step path if it fails"""
+        if not self.any_supported_browser_running():
+            return False, None
+        output = self._run_compiled('frontmost_combined', self._combined_script)
+        if output and '|' in output:
+            frontmost_app, has_x = output.rsplit('|', 1)
+            frontmost_browser = self._match_browser(frontmost_app)
+            if not frontmost_browser:
+                return False, None
+            if has_x == "true":
+                return True, frontmost_browser
+            if has_x == "false":
+                return False, frontmost_browser
+            # "unknown": script errored or browser isn't directly scriptable
+            return self._frontmost_x_com_uncached(frontmost_app)
+
+        # Combined script failed entirely; fall back to two separate calls
         frontmost_app = self.get_frontmost_application()
         if not frontmost_app:
             return False, None
-        
-        # Check if the frontmost app is a browser
-        browser_apps = ['Safari', 'Google Chrome', 'Arc', 'Firefox', 'Microsoft Edge', 
-                       'Brave Browser', 'Opera', 'Vivaldi']
-        
-        frontmost_browser = None
-        for browser in browser_apps:
-            if browser.lower() in frontmost_app.lower():
-                frontmost_browser = browser
-                break
-        
+        return self._frontmost_x_com_uncached(frontmost_app)
+
+    def any_supported_browser_running(self):
+        """In-process prefilter: is any known browser running at all?
+
+        Checking NSWorkspace's app list costs no Apple events, so callers can
+        skip AppleScript entirely when no browser is open. Returns True when
+        we can't tell (AppKit unavailable)."""
+        if not (self.system == "Darwin" and APPKIT_AVAILABLE):
+            return True
+        for app in NSWorkspace.sharedWorkspace().runningApplications():
+            if str(app.bundleIdentifier() or '') in self.BROWSER_BUNDLE_IDS:
+                return True
+        return False
+
+    def _match_browser(self, app_name):
+        """Map an application name to the matching known browser, if any"""
+        app_lower = app_name.lower()
+        for browser, browser_lower in self._BROWSER_APPS_LOWER:
+            if browser_lower in app_lower:
+                return browser
+        return None
+
+    def _frontmost_x_com_uncached(self, frontmost_app):
+        """Resolve whether frontmost_app is a browser with x.com open"""
+        frontmost_browser = self._match_browser(frontmost_app)
         if not frontmost_browser:
             return False, None
-        
-        # Now check if this specific browser has x.com open
-        browser_scripts = {
-            'Safari': '''
-                tell application "Safari"
-                    if it is running and frontmost then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
-                        end repeat
-                    end if
-                end tell
-                return "false"
-            ''',
-            'Google Chrome': '''
-                tell application "Google Chrome"
-                    if it is running and frontmost then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
-                        end repeat
-                    end if
-                end tell
-                return "false"
-            ''',
-            'Arc': '''
-                tell application "Arc"
-                    if it is running and frontmost then
-                        repeat with w in windows
-                            repeat with t in tabs of w
-                                try
-                                    set tabURL to URL of t
-                                    if tabURL contains "x.com" or tabURL contains "twitter.com" then
-                                        return "true"
-                                    end if
-                                end try
-                            end repeat
-                        end repeat
-                    end if
-                end tell
-                return "false"
-            '''
-        }
-        
-        # Try to find the matching script for the frontmost browser
-        script = None
-        for browser_name, browser_script in browser_scripts.items():
-            if browser_name.lower() in frontmost_browser.lower():
-                script = browser_script
-                break
-        
+
+        # The window title usually answers without enumerating tabs; in the
+        # common case (user is on x.com) this skips the tab script entirely
+        if self._title_has_x(self.get_active_window_title_mac()):
+            return True, frontmost_browser
+
+        script = self._frontmost_scripts.get(frontmost_browser)
         if not script:
-            # Fallback: check window title for browsers we don't have scripts for
-            title = self.get_active_window_title_mac()
-            has_x_com = "x.com" in title.lower() or " / X" in title or "(@" in title
-            return has_x_com, frontmost_browser
-        
-        # Execute the script to check for x.com
-        try:
-            result = subprocess.run(
-                ['osascript', '-e', script],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            has_x_com = result.stdout.strip() == "true"
-            return has_x_com, frontmost_browser
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+            # Title was the only signal for browsers we can't script
             return False, frontmost_browser
+
+        # Title was inconclusive; run the tab script to check for x.com
+        has_x_com = self._run_compiled(f'frontmost_{frontmost_browser}', script) == "true"
+        return has_x_com, frontmost_browser
     
+    BROWSER_PROCESSES = (
+        'Safari', 'Google Chrome', 'firefox', 'Microsoft Edge',
+        'Arc', 'Brave Browser', 'Opera', 'Vivaldi'
+    )
+    _BROWSER_PROCESSES_LOWER = tuple(b.lower() for b in BROWSER_PROCESSES)
+
     def check_browser_processes(self):
         """Check if browser processes are running"""
-        browser_processes = [
-            'Safari', 'Google Chrome', 'firefox', 'Microsoft Edge',
-            'Arc', 'Brave Browser', 'Opera', 'Vivaldi'
-        ]
-        
+        # On macOS, ask NSWorkspace for the short list of running GUI apps
+        # instead of iterating every process on the system
+        if self.system == "Darwin" and APPKIT_AVAILABLE:
+            app_names = [
+                str(app.localizedName() or '')
+                for app in NSWorkspace.sharedWorkspace().runningApplications()
+            ]
+            return [
+                name for name in app_names
+                if self._browser_regex.search(name.lower())
+            ]
+
+        # Fallback: walk the process table via psutil
         running_browsers = []
         for proc in psutil.process_iter(['pid', 'name']):
             try:
                 process_name = proc.info['name']
-                if any(browser.lower() in process_name.lower() for browser in browser_processes):
+                if self._browser_regex.search(process_name.lower()):
                     running_browsers.append(process_name)
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
-                
+
         return running_browsers
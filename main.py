@@ -6,6 +6,10 @@ A Python script that opens a small window in the bottom right corner
 when the Shift key is held down, and closes it after 2 seconds.
 """
 
+import logging
+import logging.handlers
+import os
+import queue
 import tkinter as tk
 from tkinter import messagebox
 import platform
@@ -15,6 +19,34 @@ from pynput import keyboard
 from shift_window import ShiftWindow
 
 
+class _DropOnFullQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full, so a stalled
+    consumer can never block the keyboard callback that emitted the record"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging():
+    """Configure logging once: records go through a bounded queue and a
+    listener thread does the actual stdout writes, keeping I/O off the
+    keyboard event path. Debug output is enabled via SHIFT_DEBUG."""
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(maxsize=1000)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_DropOnFullQueueHandler(log_queue))
+    root.setLevel(logging.DEBUG if os.environ.get("SHIFT_DEBUG") else logging.WARNING)
+    return listener
+
+
 def check_mac_permissions():
     """Check if running on Mac and test if permissions are already granted"""
     if platform.system() == "Darwin":  # macOS
@@ -70,6 +102,8 @@ def check_mac_permissions():
 
 def main():
     """Main function"""
+    setup_logging()
+
     # Check if required packages are installed
     try:
         import pynput
@@ -3,132 +3,203 @@
 Shift window module for creating and managing the popup window.
 """
 
+import logging
 import tkinter as tk
 import threading
 import time
 import queue
+from concurrent.futures import ThreadPoolExecutor
 from pynput import keyboard
 import platform
 from browser_detector import BrowserDetector
 
+# A Quartz event tap filtered to modifier-flag changes only wakes Python on
+# modifier transitions, unlike pynput's full keyboard tap which dispatches a
+# Python callback for every keystroke system-wide.
+try:
+    import Quartz
+    QUARTZ_AVAILABLE = True
+except ImportError:
+    QUARTZ_AVAILABLE = False
+
+# The keyboard callbacks run for every keystroke system-wide; a frozenset
+# membership test rejects non-shift keys in one hash lookup with no
+# attribute lookups or string building on the hot path
+_SHIFT_KEYS = frozenset({keyboard.Key.shift, keyboard.Key.shift_l, keyboard.Key.shift_r})
+
+# Debug logging is disabled by default (see main.py); at the default WARNING
+# level these calls cost a single level check, unlike print which takes the
+# stdout lock and a syscall on every shift press
+log = logging.getLogger(__name__)
+
 
 class ShiftWindow:
     """Manages the popup window that appears when Shift is pressed"""
-    
+
+    # Window size and distance from the screen edges
+    WINDOW_WIDTH = 200
+    WINDOW_HEIGHT = 80
+    MARGIN = 10
+
     def __init__(self):
-        self.window = None
+        self._root = None  # hidden Tk root; owns the Tcl interpreter/mainloop
+        self.window = None  # the popup Toplevel
         self.shift_pressed = False
-        self.window_timer = None
         self.running = True
         self.event_queue = queue.Queue()
         self.window_visible = False
         self.window_created = False  # Track if window has been created
         self.browser_detector = BrowserDetector()  # Add browser detector
         self.x_com_active = False
+        # Latest (is_frontmost, browser) detector result; tuple assignment
+        # is atomic in CPython so readers need no lock
+        self._latest_frontmost = (False, None)
+        # Back-to-back shift presses reuse the last answer for up to 2s; the
+        # app-activation observer zeroes the timestamp when the answer can
+        # actually have changed
+        self._xcom_cache_ts = 0.0
+        self._xcom_cache_ttl = 2.0
+        self.browser_detector.on_invalidate = self._on_app_switch
+        # Single worker so revalidation requests serialize instead of piling
+        # up concurrent AppleScript calls
+        self._check_executor = ThreadPoolExecutor(max_workers=1)
+        self._drain_after_id = None  # Tk after() handle for the queue drain
+        self._hide_after_id = None  # Tk after() handle for the hide countdown
+        self._geom = None  # cached bottom-right geometry string
+        self._screen_size = None  # cached (width, height) of the screen
+        self._frame = None  # content frame, kept for in-place config()
+        self._label = None  # text label, kept for in-place config()
+        self._last_shift_ts = 0.0  # monotonic time of last accepted press
         
+    def _on_app_switch(self):
+        """Frontmost app changed: cached x.com answers are no longer valid"""
+        self._xcom_cache_ts = 0.0
+
     def check_x_com_status(self):
-        """Check if x.com is open in the frontmost browser (periodic background check)"""
+        """Check if x.com is open in the frontmost browser"""
         if platform.system() == "Darwin":
+            now = time.monotonic()
+            if now - self._xcom_cache_ts < self._xcom_cache_ttl:
+                return self.x_com_active
             # First check if a browser with x.com is the frontmost application
             is_frontmost, browser = self.browser_detector.is_browser_frontmost_with_x_com()
+            self._latest_frontmost = (is_frontmost, browser)
+            self._xcom_cache_ts = now
             if is_frontmost:
-                print(f"✅ x.com detected in frontmost {browser}")
+                log.debug("x.com detected in frontmost %s", browser)
                 self.x_com_active = True
             else:
                 # Fallback: check if x.com is open in any browser (even if not frontmost)
                 is_open, browser = self.browser_detector.is_x_com_open_mac()
                 if is_open:
-                    print(f"⚠️  x.com detected in {browser} (not frontmost)")
+                    log.debug("x.com detected in %s (not frontmost)", browser)
                     self.x_com_active = False  # Set to False since it's not frontmost
                 else:
                     self.x_com_active = False
         return self.x_com_active
     
     def check_x_com_frontmost_now(self):
-        """Immediate check if x.com is in the frontmost browser (for shift key press)"""
+        """Check if x.com is in the frontmost browser (for shift key press).
+
+        Evaluated lazily at press time; back-to-back presses within the TTL
+        reuse the last answer without touching the detector at all."""
         if platform.system() == "Darwin":
+            now = time.monotonic()
+            if now - self._xcom_cache_ts < self._xcom_cache_ttl:
+                return self._latest_frontmost[0]
             is_frontmost, browser = self.browser_detector.is_browser_frontmost_with_x_com()
+            self._latest_frontmost = (is_frontmost, browser)
+            self._xcom_cache_ts = now
             return is_frontmost
         return False
     
     def create_window_main_thread(self):
         """Create and position the small window in bottom right corner on main thread"""
-        # Create the main window
-        window = tk.Tk()
+        # The popup is a lightweight Toplevel under the hidden root, so
+        # hiding/closing it never tears down the Tcl interpreter
+        window = tk.Toplevel(self._root)
         window.title("Telepathy")
         window.overrideredirect(True)  # Remove window decorations
         window.attributes('-topmost', True)  # Keep on top
-        
-        # Set window size
-        width = 200
-        height = 80
-        
-        # Get screen dimensions
-        screen_width = window.winfo_screenwidth()
-        screen_height = window.winfo_screenheight()
-        
-        # Calculate position for bottom right corner
-        x = screen_width - width - 10  # 10px margin from right edge
-        y = screen_height - height - 10  # 10px margin from bottom edge
-        
-        # Set window geometry
-        window.geometry(f"{width}x{height}+{x}+{y}")
+
+        # Compute the bottom-right geometry once and cache it; show_window
+        # reuses the string instead of querying the screen size every press
+        self._screen_size = (window.winfo_screenwidth(), window.winfo_screenheight())
+        self._geom = self._compute_geometry(*self._screen_size)
+        window.geometry(self._geom)
+
+        # Refresh the cached geometry if the display resolution changes
+        window.bind('<Configure>', self._refresh_geometry)
         
         # Configure window with simple background
         bg_color = '#2c3e50'  # Dark background
         window.configure(bg=bg_color)
         
-        # Create a simple frame for the content
-        frame = tk.Frame(window, bg=bg_color)
-        frame.pack(expand=True, fill='both')
-        
+        # Create a simple frame for the content; keep the widgets on self so
+        # later shows can mutate them with .config() instead of rebuilding
+        self._frame = tk.Frame(window, bg=bg_color)
+        self._frame.pack(expand=True, fill='both')
+
         # Add simple text label
-        label = tk.Label(
-            frame,
-            text="Telepathy enabled.", 
+        self._label = tk.Label(
+            self._frame,
+            text="Telepathy enabled.",
             font=('Arial', 14, 'normal'),
             fg='white',
             bg=bg_color,
             justify='center'
         )
-        label.pack(expand=True)
+        self._label.pack(expand=True)
         
-        # Initially hide the window (will be shown when needed)
+        # Start hidden; show_window deiconifies it when needed
         window.withdraw()
-        
-        # Now show the window and bring it to front
-        window.deiconify()
-        window.lift()
-        window.attributes('-topmost', True)  # Keep on top of other windows
-        window.focus_force()
-        
+
         return window
+
+    def _compute_geometry(self, screen_width, screen_height):
+        """Build the geometry string for the bottom right corner"""
+        x = screen_width - self.WINDOW_WIDTH - self.MARGIN
+        y = screen_height - self.WINDOW_HEIGHT - self.MARGIN
+        return f"{self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT}+{x}+{y}"
+
+    def _refresh_geometry(self, event=None):
+        """Recompute the cached geometry when the screen resolution changes"""
+        if not self.window:
+            return
+        screen_size = (self.window.winfo_screenwidth(), self.window.winfo_screenheight())
+        if screen_size != self._screen_size:
+            self._screen_size = screen_size
+            self._geom = self._compute_geometry(*screen_size)
     
     def start_timer(self):
-        """Start a 2-second timer to close the window"""
-        if self.window_timer:
-            self.window_timer.cancel()
-        
-        self.window_timer = threading.Timer(2.0, self.schedule_window_close)
-        self.window_timer.start()
-    
-    def schedule_window_close(self):
-        """Schedule window hide on main thread"""
-        self.event_queue.put("hide_window")
-    
+        """(Re)start the 2-second hide countdown on the Tk event loop"""
+        if self._hide_after_id:
+            try:
+                self.window.after_cancel(self._hide_after_id)
+            except tk.TclError:
+                pass
+        self._hide_after_id = self.window.after(2000, self.hide_window)
+
     def hide_window(self):
         """Hide the window without destroying it"""
-        if self.window and self.window_visible:
+        self._hide_after_id = None
+        if not self.window or not self.window_visible:
+            return  # already hidden: a single bool check, no Tcl traffic
+        try:
+            self.window.withdraw()  # Hide the window
+            self.window_visible = False
+            log.debug("Window hidden")
+        except tk.TclError:
+            pass  # Window might already be destroyed
+
+    def close_window(self):
+        """Close the window and the hidden root completely (app exit only)"""
+        if self._root and self._drain_after_id:
             try:
-                self.window.withdraw()  # Hide the window
-                self.window_visible = False
-                print("Window hidden")
+                self._root.after_cancel(self._drain_after_id)
             except tk.TclError:
-                pass  # Window might already be destroyed
-        self.window_timer = None
-    
-    def close_window(self):
-        """Close the window completely"""
+                pass
+            self._drain_after_id = None
         if self.window:
             try:
                 self.window.destroy()
@@ -137,69 +208,103 @@ class ShiftWindow:
             self.window = None
             self.window_created = False
             self.window_visible = False
-        self.window_timer = None
+        if self._root:
+            try:
+                self._root.destroy()
+            except tk.TclError:
+                pass
+            self._root = None
+        self._hide_after_id = None
     
     def show_window(self):
         """Show the window with proper dimensions and position"""
-        if self.window and not self.window_visible:
-            try:
-                # Restore window to proper size and position
-                width = 200
-                height = 80
-                
-                # Get screen dimensions
-                screen_width = self.window.winfo_screenwidth()
-                screen_height = self.window.winfo_screenheight()
-                
-                # Calculate position for bottom right corner
-                x = screen_width - width - 10  # 10px margin from right edge
-                y = screen_height - height - 10  # 10px margin from bottom edge
-                
-                # Set window geometry
-                self.window.geometry(f"{width}x{height}+{x}+{y}")
-                self.window.attributes('-topmost', True)  # Keep on top
-                self.window.deiconify()  # Show the window
-                self.window.lift()
-                self.window.focus_force()
-                self.window_visible = True
-                print("Window shown")
-            except tk.TclError:
-                # Window might be destroyed, recreate it
-                self.window = None
-                self.window_created = False
-                self.window_visible = False
+        if not self.window or self.window_visible:
+            return  # already shown: callers just re-arm the hide timer
+        try:
+            # Restore window to proper size and position; -topmost was set
+            # once at creation, so deiconify alone brings it back on top
+            self.window.geometry(self._geom)
+            self.window.deiconify()  # Show the window
+            self.window_visible = True
+            log.debug("Window shown")
+        except tk.TclError:
+            # Window might be destroyed, recreate it
+            self.window = None
+            self.window_created = False
+            self.window_visible = False
     
     def on_shift_press(self, key):
         """Handle Shift key press"""
-        # Log all key presses
-        try:
-            key_name = key.name if hasattr(key, 'name') else str(key)
-        except:
-            key_name = str(key)
+        # Non-shift keys exit immediately; no string work per keystroke
+        if key not in _SHIFT_KEYS or self.shift_pressed:
+            return
+
+        # Debounce: autorepeat and paired left/right shift events arrive
+        # within a few ms of each other and should not requeue work
+        now = time.monotonic()
+        if now - self._last_shift_ts < 0.05:
+            return
+        self._last_shift_ts = now
+
+        log.debug("Shift key detected; checking x.com frontmost status")
+        self.shift_pressed = True
+
+        # Stale-while-revalidate: act on the last known answer immediately so
+        # the window never waits on an Apple-event round trip, then refresh in
+        # the background and correct the window state if the answer changed
+        if self._latest_frontmost[0]:
+            log.debug("x.com is frontmost (cached); requesting window")
+            self.event_queue.put("create_window")
+        else:
+            log.debug("x.com is not frontmost (cached); window not shown")
+        self._check_executor.submit(self._revalidate_x_com)
+
+    def _revalidate_x_com(self):
+        """Refresh the x.com answer off the keyboard thread and reconcile
+        the window if the fresh answer differs from what was shown"""
+        was_frontmost = self._latest_frontmost[0]
+        is_frontmost = self.check_x_com_frontmost_now()
+        if is_frontmost != was_frontmost:
+            log.debug("x.com state changed to %s on revalidation", is_frontmost)
+            self.event_queue.put("create_window" if is_frontmost else "hide_window")
 
-        if ('shift' in key_name) and not self.shift_pressed:
-            print("🎯 Shift key detected! Checking x.com frontmost status...")
-            self.shift_pressed = True
-            
-            # Check if x.com is in frontmost browser before showing window
-            if self.check_x_com_frontmost_now():
-                print("✅ X.com is frontmost! Creating window...")
-                # Send event to main thread via queue
-                self.event_queue.put("create_window")
-            else:
-                print("❌ X.com is not frontmost. Window not shown.")
-    
     def on_shift_release(self, key):
         """Handle Shift key release"""
-        # Log all key releases
-        try:
-            key_name = key.name if hasattr(key, 'name') else str(key)
-        except:
-            key_name = str(key)
-        
-        if 'shift' in key_name:
+        if key in _SHIFT_KEYS:
             self.shift_pressed = False
     
+    def _run_flags_changed_tap(self):
+        """Listen for Shift via a Quartz event tap filtered to flags-changed
+        events, so Python only wakes on modifier transitions instead of on
+        every keystroke"""
+        def tap_callback(proxy, event_type, event, refcon):
+            flags = Quartz.CGEventGetFlags(event)
+            shift_down = bool(flags & Quartz.kCGEventFlagMaskShift)
+            if shift_down and not self.shift_pressed:
+                self.on_shift_press(keyboard.Key.shift)
+            elif not shift_down and self.shift_pressed:
+                self.on_shift_release(keyboard.Key.shift)
+            return event
+
+        tap = Quartz.CGEventTapCreate(
+            Quartz.kCGSessionEventTap,
+            Quartz.kCGHeadInsertEventTap,
+            Quartz.kCGEventTapOptionListenOnly,
+            Quartz.CGEventMaskBit(Quartz.kCGEventFlagsChanged),
+            tap_callback,
+            None
+        )
+        if tap is None:
+            print("❌ Could not create event tap - check accessibility permissions")
+            return
+
+        source = Quartz.CFMachPortCreateRunLoopSource(None, tap, 0)
+        Quartz.CFRunLoopAddSource(
+            Quartz.CFRunLoopGetCurrent(), source, Quartz.kCFRunLoopCommonModes
+        )
+        Quartz.CGEventTapEnable(tap, True)
+        Quartz.CFRunLoopRun()
+
     def start_monitoring(self):
         """Start monitoring keyboard for Shift key"""
         print("\n" + "=" * 50)
@@ -212,79 +317,94 @@ class ShiftWindow:
         print("Press Ctrl+C to exit.")
         print("=" * 50)
         
+        # Build the hidden root and the popup before the keyboard listener
+        # starts, so the very first Shift press pays no Tk initialization
+        # cost and can never race window construction
+        self._root = tk.Tk()
+        self._root.withdraw()
+        self.window = self.create_window_main_thread()
+        self.window_created = True
+
         # Start keyboard listener in a separate thread
         def keyboard_monitor():
+            if QUARTZ_AVAILABLE and platform.system() == "Darwin":
+                # Fail fast: without accessibility permission a tap (or
+                # pynput's listener) hangs or emits garbage instead of
+                # erroring, leaving a runaway listener thread behind
+                preflight = getattr(Quartz, 'CGPreflightListenEventAccess', None)
+                if preflight is not None and not preflight():
+                    print("❌ Accessibility permission not granted - keyboard monitoring disabled.")
+                    print("   Grant access in System Settings > Privacy & Security >")
+                    print("   Accessibility, then restart the app.")
+                    return
+                self._run_flags_changed_tap()
+                return
+            # suppress=False pinned explicitly: a listen-only tap never has
+            # to re-post events, so it is strictly cheaper and can't stall
+            # system input if our callback is slow
             with keyboard.Listener(
                 on_press=self.on_shift_press,
-                on_release=self.on_shift_release
+                on_release=self.on_shift_release,
+                suppress=False
             ) as listener:
                 try:
                     listener.join()
                 except KeyboardInterrupt:
                     print("\nExiting...")
                     self.running = False
-                    if self.window:
+                    if self.window or self._root:
                         self.close_window()
         
         # Start keyboard monitoring in background thread
         keyboard_thread = threading.Thread(target=keyboard_monitor, daemon=True)
         keyboard_thread.start()
         
-        # Add periodic x.com checking
-        def check_browser_periodically():
-            while self.running:
-                self.check_x_com_status()
-                time.sleep(5)  # Check every 5 seconds
-        
-        browser_thread = threading.Thread(target=check_browser_periodically, daemon=True)
-        browser_thread.start()
-        
-        # Run tkinter main loop on main thread
+        # No periodic poller: x.com state is evaluated lazily at shift-press
+        # time, and the detector invalidates its cache on app activation, so
+        # nothing spawns osascript while the app sits idle.
+
+        # Let Tk's mainloop drive the UI; background threads hand work over
+        # through the event queue, which a periodic after() callback drains.
+        # No busy-polling, near-zero idle CPU.
+        self._drain_after_id = self._root.after(50, self._drain_events)
         try:
-            while self.running:
-                # Check for events from keyboard thread
-                try:
-                    event = self.event_queue.get_nowait()
-                    if event == "create_window":
-                        if not self.window_created:
-                            print("Creating window on main thread...")
-                            self.window = self.create_window_main_thread()
-                            self.window_visible = True
-                            self.window_created = True
-                            # Start timer only when window is first created
-                            self.start_timer()
-                        elif not self.window_visible:
-                            print("Showing existing window...")
-                            self.show_window()
-                            self.start_timer()
-                        else:
-                            print("Window already visible, resetting timer...")
-                            self.start_timer()
-                    elif event == "hide_window":
-                        print("Hiding window on main thread...")
-                        self.hide_window()
-                    elif event == "close_window":
-                        print("Closing window on main thread...")
-                        self.close_window()
-                        print("Window closed successfully")
-                except queue.Empty:
-                    pass
-                
-                # Update tkinter window if it exists
-                if self.window:
-                    try:
-                        self.window.update()
-                    except tk.TclError:
-                        # Window was closed
-                        self.window = None
-                
-                time.sleep(0.01)  # Small delay to prevent high CPU usage
+            self._root.mainloop()
         except KeyboardInterrupt:
             print("\nExiting...")
-            self.running = False
-            if self.window:
-                self.close_window()
         finally:
             self.running = False
-            if self.window:
+            if self.window or self._root:
                 self.close_window()
+
+    def _drain_events(self):
+        """Process all pending events from background threads, then reschedule"""
+        events = []
+        try:
+            while True:
+                events.append(self.event_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        # Coalesce the batch: a close supersedes everything, otherwise only
+        # the most recent show/hide request matters
+        if events:
+            if "close_window" in events:
+                log.debug("Closing window on main thread")
+                self.close_window()
+            else:
+                for event in reversed(events):
+                    if event == "create_window":
+                        if not self.window_visible:
+                            log.debug("Showing window on main thread")
+                            self.show_window()
+                        else:
+                            log.debug("Window already visible, resetting timer")
+                        self.start_timer()
+                        break
+                    if event == "hide_window":
+                        log.debug("Hiding window on main thread")
+                        self.hide_window()
+                        break
+
+        if self.running and self._root:
+            self._drain_after_id = self._root.after(50, self._drain_events)